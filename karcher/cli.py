@@ -92,13 +92,14 @@ def safe_cli():
 
 
 @cli.command()
+@click.option('--no-cache', is_flag=True, help='Fetch URLs from the server instead of the cache.')
 @click.pass_context
 @coro
-async def urls(ctx: click.Context):
+async def urls(ctx: click.Context, no_cache: bool):
     """Get URL information."""
 
     kh = await KarcherHome.create(country=ctx.obj.country)
-    d = await kh.get_urls()
+    d = await kh.get_urls(use_cache=not no_cache)
     await kh.close()
 
     ctx.obj.print(d)
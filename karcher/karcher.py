@@ -3,19 +3,20 @@
 # SPDX-License-Identifier: MIT
 # -----------------------------------------------------------
 
-import collections
+import asyncio
 import json
 import threading
 from typing import List, Any
 import aiohttp
 import urllib.parse
+from yarl import URL
 
 from .auth import Domains, Session
 from .countries import get_country_code, get_region_by_country
 from .consts import (
-    APP_VERSION_CODE, APP_VERSION_NAME, PROJECT_TYPE, PROTOCOL_VERSION,
-    REGION_URLS, ROBOT_PROPERTIES, SSL_CERTIFICATE_THUMBPRINT, TENANT_ID,
-    Language, Region
+    APP_VERSION_CODE, APP_VERSION_NAME, DOMAINS_CACHE_TTL, PROJECT_TYPE,
+    PROTOCOL_VERSION, REGION_URLS, ROBOT_PROPERTIES, SSL_CERTIFICATE_THUMBPRINT,
+    TENANT_ID, Language, Region
 )
 from .device import Device, DeviceProperties
 from .exception import KarcherHomeAccessDenied, KarcherHomeException, handle_error_code
@@ -23,10 +24,23 @@ from .map import Map
 from .mqtt import MqttClient, get_device_topic_property_get_reply, get_device_topics
 from .user import UserProfile
 from .utils import (
-    decrypt, decrypt_map, encrypt, get_nonce, get_random_string,
-    get_timestamp, get_timestamp_ms, is_email, md5
+    decrypt_bytes, decrypt_map, encrypt, get_nonce, get_random_string, get_sign,
+    get_timestamp, get_timestamp_ms, is_email, json_dumps, json_loads,
+    read_cache, write_cache
 )
 
+_SSL_FINGERPRINT = aiohttp.Fingerprint(SSL_CERTIFICATE_THUMBPRINT)
+_USER_AGENT = 'Android_' + TENANT_ID
+_PHONE_BRAND = encrypt('xiaomi_mi 9')
+
+
+def _parse_map(dev: Device, map: int, data: bytes):
+    data = decrypt_map(dev.sn, dev.mac, dev.product_id, data)
+    if map == 1 or map == 2:
+        return Map.parse(data)
+    else:
+        return json_loads(data)
+
 
 class KarcherHome:
     """Main class to access Karcher Home Robots API"""
@@ -84,16 +98,18 @@ class KarcherHome:
                 await self._http.close()
             self._http = None
 
-    async def _request(self, method: str, url: str, **kwargs) -> aiohttp.ClientResponse:
+    def _get_http(self) -> aiohttp.ClientSession:
         if self._http is None:
             self._http_external = False
             self._http = aiohttp.ClientSession()
+        return self._http
 
+    async def _request(self, method: str, url: str, **kwargs) -> aiohttp.ClientResponse:
         headers = {}
         if kwargs.get('headers') is not None:
             headers = kwargs['headers']
 
-        headers['User-Agent'] = 'Android_' + TENANT_ID
+        headers['User-Agent'] = _USER_AGENT
         auth = ''
         if self._session is not None and self._session.auth_token != '':
             auth = self._session.auth_token
@@ -106,72 +122,76 @@ class KarcherHome:
         nonce = get_nonce()
         ts = str(get_timestamp())
         data = ''
+        url = self._base_url + url
         if method == 'GET':
-            params = kwargs.get('params') or {}
+            params = kwargs.pop('params', None) or {}
             if isinstance(params, str):
-                params = urllib.parse.parse_qs(params)
-            buf = urllib.parse.urlencode(params)
-            data = buf
-            kwargs['params'] = buf
+                data = params
+            else:
+                data = urllib.parse.urlencode(params, doseq=True)
+            if data != '':
+                url += '?' + data
         elif method == 'POST' or method == 'PUT':
-            v = params = kwargs.get('json') or {}
-            if isinstance(v, dict):
-                v = collections.OrderedDict(v.items())
-                for key, val in v.items():
-                    data += key
-                    if val is None:
-                        data += 'null'
-                    elif isinstance(val, str):
-                        data += val
-                    elif isinstance(val, dict):
-                        data += json.dumps(val, separators=(',', ':'))
-                    else:
-                        data += str(val)
-                kwargs['json'] = v
-
-        headers['sign'] = md5(auth + ts + nonce + data)
+            data = kwargs.pop('json', None) or {}
+            # Encode the body once, compactly, instead of through aiohttp's json=
+            kwargs['data'] = json_dumps(data)
+            headers['Content-Type'] = 'application/json'
+
+        headers['sign'] = get_sign(auth, ts, nonce, data)
         headers['ts'] = ts
         headers['nonce'] = nonce
 
         kwargs['headers'] = headers
-        kwargs['ssl'] = aiohttp.Fingerprint(SSL_CERTIFICATE_THUMBPRINT)
-        return await self._http.request(method, self._base_url + url, **kwargs)
+        kwargs['ssl'] = _SSL_FINGERPRINT
+        # Query string is already encoded and signed, do not let yarl requote it
+        return await self._get_http().request(method, URL(url, encoded=True), **kwargs)
 
     async def _download(self, url) -> bytes:
         headers = {
-            'User-Agent': 'Android_' + TENANT_ID,
+            'User-Agent': _USER_AGENT,
         }
 
-        resp = await self._http.get(url, headers=headers)
-        if resp.status != 200:
-            raise KarcherHomeException(-1,
-                                       'HTTP error: ' + str(resp.status_code))
-
-        data = await resp.content.read(-1)
-        resp.close()
+        async with self._get_http().get(url, headers=headers) as resp:
+            if resp.status != 200:
+                raise KarcherHomeException(-1,
+                                           'HTTP error: ' + str(resp.status))
+
+            # Stream straight into a buffer of the advertised size when the
+            # body is not content-encoded, avoiding chunk list joining
+            size = resp.content_length
+            if size is None or 'Content-Encoding' in resp.headers:
+                return await resp.read()
+
+            data = bytearray(size)
+            view = memoryview(data)
+            pos = 0
+            async for chunk in resp.content.iter_chunked(65536):
+                view[pos:pos + len(chunk)] = chunk
+                pos += len(chunk)
+            view.release()
 
         return data
 
     async def _process_response(self, resp: aiohttp.ClientResponse, prop=None) -> Any:
-        if resp.status != 200:
+        if not 200 <= resp.status < 300:
             resp.close()
             raise KarcherHomeException(-1,
                                        'HTTP error: ' + str(resp.status))
-        data = await resp.json()
+        data = json_loads(await resp.read())
         resp.close()
 
         # Check for error response
         if data['code'] != 0:
             handle_error_code(data['code'], data['msg'])
         # Check for empty response
-        if 'result' not in data:
+        result = data.get('result')
+        if result is None:
             return None
         # Handle special response types
-        result = data['result']
         if isinstance(result, str):
             raise KarcherHomeException(-2, 'Invalid response: ' + result)
         if prop is not None:
-            return json.loads(decrypt(result[prop]))
+            return json_loads(decrypt_bytes(result[prop]))
         return result
 
     def _mqtt_connect(self, wait_for_connect=False):
@@ -203,8 +223,17 @@ class KarcherHome:
             event.wait()
             self._mqtt.on_connect = None
 
-    async def get_urls(self) -> Domains:
-        """Get URLs for API and MQTT."""
+    async def get_urls(self, use_cache: bool = True) -> Domains:
+        """Get URLs for API and MQTT.
+
+        Result is cached on disk per region for DOMAINS_CACHE_TTL seconds.
+        """
+
+        cache_name = 'domains-' + get_region_by_country(self._country).value + '.json'
+        if use_cache:
+            data = read_cache(cache_name, DOMAINS_CACHE_TTL)
+            if data is not None:
+                return Domains(**data)
 
         resp = await self._request('GET', '/network-service/domains/list', params={
             'tenantId': TENANT_ID,
@@ -213,6 +242,7 @@ class KarcherHome:
         })
 
         data = await self._process_response(resp, 'domain')
+        write_cache(cache_name, data)
         return Domains(**data)
 
     async def login(self, username, password, register_id=None) -> Session:
@@ -235,7 +265,7 @@ class KarcherHome:
             'projectType': PROJECT_TYPE,
             'versionCode': APP_VERSION_CODE,
             'versionName': APP_VERSION_NAME,
-            'phoneBrand': encrypt('xiaomi_mi 9'),
+            'phoneBrand': _PHONE_BRAND,
             'phoneSys': 1,
             'noticeSetting': {
                 'andIpad': register_id,
@@ -308,7 +338,7 @@ class KarcherHome:
 
         return [Device(**d) for d in await self._process_response(resp)]
 
-    async def get_map_data(self, dev: Device, map: int = 1):
+    async def _get_map_access_url(self, dev: Device, map: int) -> str:
         # <tenantId>/<modeType>/<deviceSn>/01-01-2022/map/temp/0046690461_<deviceSn>_1
         mapDir = TENANT_ID + '/' + dev.product_mode_code + '/' +\
             dev.sn + '/01-01-2022/map/temp/0046690461_' + \
@@ -324,16 +354,52 @@ class KarcherHome:
                                    })
 
         data = await self._process_response(resp)
-        downloadUrl = data['url']
         if 'cdnDomain' in data and data['cdnDomain'] != '':
-            downloadUrl = 'https://' + data['cdnDomain'] + '/' + data['dir']
-
-        data = await self._download(downloadUrl)
-        data = decrypt_map(dev.sn, dev.mac, dev.product_id, data)
-        if map == 1 or map == 2:
-            return Map.parse(data)
-        else:
-            return json.loads(data)
+            return 'https://' + data['cdnDomain'] + '/' + data['dir']
+        return data['url']
+
+    async def _decode_map(self, dev: Device, map: int, data: bytes):
+        # Decrypting and parsing is CPU bound, keep it off the event loop
+        return await asyncio.get_running_loop().run_in_executor(
+            None, _parse_map, dev, map, data)
+
+    async def get_map_data(self, dev: Device, map: int = 1):
+        url = await self._get_map_access_url(dev, map)
+        return await self._decode_map(dev, map, await self._download(url))
+
+    async def get_map_data_many(
+            self,
+            dev: Device,
+            maps: List[int],
+            max_concurrency: int = 4) -> list:
+        """Get data for multiple maps concurrently.
+
+        Access URL requests and map downloads go to different hosts, so
+        each is limited to max_concurrency requests in flight separately.
+        """
+
+        if max_concurrency < 1:
+            raise ValueError('max_concurrency must be at least 1')
+
+        api_slots = asyncio.Semaphore(max_concurrency)
+        download_slots = asyncio.Semaphore(max_concurrency)
+
+        async def fetch(map: int):
+            async with api_slots:
+                url = await self._get_map_access_url(dev, map)
+            async with download_slots:
+                data = await self._download(url)
+            return await self._decode_map(dev, map, data)
+
+        tasks = [asyncio.ensure_future(fetch(map)) for map in maps]
+        try:
+            return list(await asyncio.gather(*tasks))
+        except BaseException:
+            # Do not leave the remaining fetches running in the background
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
 
     def subscribe_device(self, dev: Device):
         """Subscribe to device real-time events."""
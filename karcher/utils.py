@@ -4,10 +4,15 @@
 # -----------------------------------------------------------
 
 import base64
+import binascii
+import functools
 import hashlib
+import json
+import os
 import random
 import re
 import string
+import tempfile
 import time
 from typing import Final
 import zlib
@@ -15,8 +20,22 @@ from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
 
 from .consts import TENANT_ID, Product
 
+try:
+    import orjson
+
+    def json_dumps(data) -> bytes:
+        return orjson.dumps(data)
+
+    json_loads = orjson.loads
+except ImportError:
+    def json_dumps(data) -> bytes:
+        return json.dumps(data, separators=(',', ':')).encode()
+
+    json_loads = json.loads
+
 
 EMAIL_REGEX: Final = "^\\w+([-+.]\\w+)*@\\w+([-.]\\w+)*\\.\\w+([-.]\\w+)*$"
+_EMAIL_RE: Final = re.compile(EMAIL_REGEX)
 
 
 def get_random_string(length: int) -> str:
@@ -40,6 +59,7 @@ def get_timestamp_ms() -> int:
     return int(time.time() * 1000)
 
 
+@functools.lru_cache(maxsize=None)
 def get_enc_key() -> bytes:
     m = hashlib.md5()
     m.update(bytes(TENANT_ID, 'utf-8'))
@@ -47,10 +67,14 @@ def get_enc_key() -> bytes:
     return bytes(h[8:24], 'utf-8')
 
 
-def decrypt(data) -> str:
+def decrypt_bytes(data) -> bytes:
     cipher = Cipher(algorithms.AES128(get_enc_key()), modes.ECB())
     buf = cipher.decryptor().update(base64.b64decode(data))
-    return str(buf[:-ord(buf[-1:])], 'utf-8')
+    return buf[:-buf[-1]]
+
+
+def decrypt(data) -> str:
+    return str(decrypt_bytes(data), 'utf-8')
 
 
 def encrypt(data) -> str:
@@ -61,6 +85,7 @@ def encrypt(data) -> str:
     return base64.b64encode(cipher.encryptor().update(buf)).decode()
 
 
+@functools.lru_cache(maxsize=16)
 def get_map_enc_key(sn: str, mac: str, product_id: Product) -> bytes:
     sub_key = mac.replace(':', '').lower() + str(product_id.value)
     cipher = Cipher(algorithms.AES128(bytes(sub_key[0:16], 'utf-8')), modes.ECB())
@@ -80,10 +105,36 @@ def decrypt_map(sn: str, mac: str, product_id: Product, data: bytes) -> bytes:
     key = get_map_enc_key(sn, mac, product_id)
     cipher = Cipher(algorithms.AES128(key), modes.ECB())
     buf = cipher.decryptor().update(base64.b64decode(data))
+    buf = binascii.unhexlify(memoryview(buf)[:-buf[-1]])
     try:
-        return zlib.decompress(bytes.fromhex(str(buf[:-ord(buf[-1:])], 'utf-8')))
-    except Exception:
-        return bytes.fromhex(str(buf[:-ord(buf[-1:])], 'utf-8'))
+        return zlib.decompress(buf)
+    except zlib.error:
+        return buf
+
+
+def get_sign(auth: str, ts: str, nonce: str, data) -> str:
+    """Calculate request signature.
+
+    data is either the encoded GET query string or the POST/PUT body.
+    Body fields are signed as concatenated keys and values in order.
+    """
+
+    buf = bytearray((auth + ts + nonce).encode())
+    if isinstance(data, str):
+        buf += data.encode()
+    elif isinstance(data, dict):
+        for key, val in data.items():
+            buf += key.encode()
+            if val is None:
+                buf += b'null'
+            elif isinstance(val, str):
+                buf += val.encode()
+            elif isinstance(val, dict):
+                # Always stdlib json, orjson would not escape non-ASCII
+                buf += json.dumps(val, separators=(',', ':')).encode()
+            else:
+                buf += str(val).encode()
+    return hashlib.md5(buf).hexdigest()
 
 
 def md5(data: str) -> str:
@@ -93,9 +144,44 @@ def md5(data: str) -> str:
 
 
 def is_email(email: str) -> bool:
-    return re.search(EMAIL_REGEX, email) is not None
+    return _EMAIL_RE.search(email) is not None
+
+
+def get_cache_dir() -> str:
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache')
+    return os.path.join(base, 'karcher')
+
+
+def read_cache(name: str, ttl: int):
+    """Read cached JSON data if it is not older than ttl seconds."""
+
+    path = os.path.join(get_cache_dir(), name)
+    try:
+        if time.time() - os.path.getmtime(path) > ttl:
+            return None
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def write_cache(name: str, data) -> None:
+    """Atomically write JSON data to cache, ignoring any I/O errors."""
+
+    cache_dir = get_cache_dir()
+    tmp = None
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(prefix=name + '.', dir=cache_dir)
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        os.replace(tmp, os.path.join(cache_dir, name))
+    except OSError:
+        if tmp is not None and os.path.exists(tmp):
+            os.unlink(tmp)
 
 
+@functools.lru_cache(maxsize=256)
 def snake_case(value: str) -> str:
     first_underscore = re.sub('(.)([A-Z][a-z]+)', r'\1_\2', value)
     return re.sub('([a-z0-9])([A-Z])', r'\1_\2', first_underscore).lower()
@@ -21,9 +21,12 @@ setup(
         'click',
         'aiohttp',
         'paho-mqtt',
-        'cryptography',
-        'protobuf'
+        'cryptography>=40.0',
+        'protobuf>=4.22'
     ],
+    extras_require={
+        'speedups': ['orjson'],
+    },
     entry_points='''
         [console_scripts]
         karcher-home=karcher.cli:safe_cli
@@ -0,0 +1,29 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from karcher.utils import read_cache, write_cache
+
+class TestCache(unittest.TestCase):
+
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        patcher = mock.patch.dict(os.environ, {'XDG_CACHE_HOME': self._tmp.name})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self._tmp.cleanup)
+
+    def test_roundtrip(self):
+        write_cache('domains-eu.json', {'APP_api': 'eu-appaiot.3irobotix.net:443'})
+        self.assertEqual(read_cache('domains-eu.json', 60), {'APP_api': 'eu-appaiot.3irobotix.net:443'})
+        self.assertEqual(os.listdir(os.path.join(self._tmp.name, 'karcher')), ['domains-eu.json'])
+
+    def test_missing(self):
+        self.assertIsNone(read_cache('domains-us.json', 60))
+
+    def test_expired(self):
+        write_cache('domains-eu.json', {'MQTT': 'eu-mqttaiot.3irobotix.net:8883'})
+        path = os.path.join(self._tmp.name, 'karcher', 'domains-eu.json')
+        os.utime(path, (0, 0))
+        self.assertIsNone(read_cache('domains-eu.json', 60))
@@ -1,6 +1,10 @@
+import base64
 import unittest
+import zlib
+from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
 
-from karcher.utils import encrypt, decrypt
+from karcher.consts import Product
+from karcher.utils import encrypt, decrypt, decrypt_map, get_map_enc_key
 
 class TestEncryption(unittest.TestCase):
 
@@ -11,3 +15,18 @@ class TestEncryption(unittest.TestCase):
     def test_encrypt(self):
         data = encrypt('{"MQTT":"eu-mqttaiot.3irobotix.net:8883","MQTT_ga":"eu-gamqttaiot.3irobotix.net:8883","APP_api":"eu-appaiot.3irobotix.net:443","APP_cdn":"eu-cdnappaiot.3irobotix.net:443","MAP_cdn":"eu-aiot-map-prod.s3.eu-central-1.amazonaws.com:443","DEV_api":"eu-devaiot.3irobotix.net:443","DEV_ota":"eu-otaaiot.3irobotix.net:443","APP_log":"eu-aiot-applog-prod.s3.eu-central-1.amazonaws.com:443","dev_log":"eu-aiot-devlog-prod.s3.eu-central-1.amazonaws.com:443","APP_api_CDN":"eu-cdnappaiot.3irobotix.net:443","DEV_api_CDN":"eu-cdndevaiot.3irobotix.net:443","DEV_ota_CDN":"eu-cdnotaaiot.3irobotix.net:443","image":"eu-aiot-image-prod.s3.eu-central-1.amazonaws.com:443","video":"eu-aiot-video-prod.s3.eu-central-1.amazonaws.com:443","update_package":"eu-aiot-updatepkg-prod.s3.eu-central-1.amazonaws.com:443","all":"eu-aiot-all-prod.s3.eu-central-1.amazonaws.com:443"}')
         self.assertEqual(data, 'q06cOyUjGcswPH0i916itKF3G5uhM8CohKvA4JwiDDd0jRjyvlSnkZn1wrzLlzBqsMpbXXvVptjh1WHDH95zZX43GZq9SylQRXuUK4hHua7vJ3TFvXCzd4k8IadUHRKmMctwCdshHOMTN/IkU37ps1zgThAhVpZp4VPi6MCUripeb+5qZoqKUuZ9lzvGlV7ZUv+ZRBOJ6+dSE0F8hB9i1sC9t7c9bLEYt7VV/PMXvGCKxk6ZHnddV3WgmGjGdsFdh6EiMJhbRzEdovYAhpDKUIOtD8Vt47EXsIKMKst2k13BH/fAgdzFLxhnQo2NHsAHZLhtBxcYQIFcJVIqdYk5twGVt/8D0ifoKO+E8v6j1VCCNwCLQmKHr8xKjys5q90XtbqGwK6j2OFPa6ZUmuWKRhqFUyoUbCfYRpiC9aZRjEdXkN4csYOdMsXuZBBfbnoGEjI8e8uUaP2/sPNd6ILiqYRv/2OyyADCoRfGrsbqSnQGlEH+iryeSWgJvnGOf/J4LcOEqh8nDi5UTspG/NYi1O1Sa4b7iefoor20G3c0Zu7asCGZ/VkdT8x9xk2I2ksKamlV3ftVUJkcM+9Tp4tS5RthgzseKV0PyXGLMEhnh3lJqh1ByT78Xm8X1EhOe3A3HcepETVACw0JO/OeibKwCRIH7TrC202rbGOCvWIY5BM9dXyluhjrteENyneof9saHcepETVACw0JO/OeibKwCfHLASf0t5IqfQ0uGxMdItqgqZ1FgN9RcLlMl/D+SmtLHcepETVACw0JO/OeibKwCeN4ZodHKjFM4awsbMl04nPdfjZkAzFa90sH4H/kPi5OcOP44gm3J/1Fh7376W6SwcQbc5x0t/UjUGKgfFmkcf+gUU9ll76laKw3gqJXG+4HhA/igwmxZs8yeDCs5DdProRv/2OyyADCoRfGrsbqSnSn6luQIt03FhYf85i+fN0ftk9e/pBl/uB6nEkiP4kR3jxzh7CWkdnbgdP9KXmx2fgyvlASK5NX8hCky0HSBURGg60PxW3jsRewgowqy3aTXXukwghC9ypGZKsbLAbZE/GdpbaRN+STHF28Q7x/NZtzGiPRM7Ebp/h/qfHSUG4DR0W/f6DINZn3fP1WPjgZBgZS8bT98aaemSIZCxRmj0l3')
+
+    def _encrypt_map(self, data: bytes) -> bytes:
+        key = get_map_enc_key('SN0001', 'AA:BB:CC:DD:EE:FF', Product.RCV3)
+        buf = data.hex().encode()
+        pad_len = 16 - (len(buf) % 16)
+        buf = buf + bytes([pad_len]) * pad_len
+        return base64.b64encode(Cipher(algorithms.AES128(key), modes.ECB()).encryptor().update(buf))
+
+    def test_decrypt_map(self):
+        data = decrypt_map('SN0001', 'AA:BB:CC:DD:EE:FF', Product.RCV3, self._encrypt_map(zlib.compress(b'{"map":1}')))
+        self.assertEqual(data, b'{"map":1}')
+
+    def test_decrypt_map_uncompressed(self):
+        data = decrypt_map('SN0001', 'AA:BB:CC:DD:EE:FF', Product.RCV3, self._encrypt_map(b'{"map":2}'))
+        self.assertEqual(data, b'{"map":2}')
@@ -0,0 +1,122 @@
+import asyncio
+import base64
+import json
+import os
+import tempfile
+import unittest
+import zlib
+from unittest import mock
+from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+
+from karcher.consts import Product
+from karcher.device import Device
+from karcher.karcher import KarcherHome
+from karcher.utils import get_map_enc_key, read_cache
+
+DOMAINS = {
+    'APP_api': 'eu-appaiot.3irobotix.net:443',
+    'MQTT': 'eu-mqttaiot.3irobotix.net:8883',
+}
+DEVICE = Device(sn='SN0001', mac='AA:BB:CC:DD:EE:FF', productId=Product.RCV3.value)
+
+
+def encrypt_map(data: bytes) -> bytes:
+    key = get_map_enc_key(DEVICE.sn, DEVICE.mac, DEVICE.product_id)
+    buf = zlib.compress(data).hex().encode()
+    pad_len = 16 - (len(buf) % 16)
+    buf = buf + bytes([pad_len]) * pad_len
+    return base64.b64encode(Cipher(algorithms.AES128(key), modes.ECB()).encryptor().update(buf))
+
+class TestUrls(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        patcher = mock.patch.dict(os.environ, {'XDG_CACHE_HOME': self._tmp.name})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self._tmp.cleanup)
+
+        self.kh = KarcherHome()
+        self.kh._country = 'GB'
+        self.request = mock.patch.object(self.kh, '_request', new_callable=mock.AsyncMock).start()
+        self.process = mock.patch.object(self.kh, '_process_response', new_callable=mock.AsyncMock).start()
+        self.addCleanup(mock.patch.stopall)
+
+    async def test_miss_writes_cache(self):
+        self.process.return_value = DOMAINS
+        urls = await self.kh.get_urls()
+        self.assertEqual(urls.app_api, 'https://eu-appaiot.3irobotix.net:443')
+        self.assertEqual(self.request.await_count, 1)
+        self.assertEqual(os.listdir(os.path.join(self._tmp.name, 'karcher')), ['domains-eu.json'])
+        self.assertEqual(read_cache('domains-eu.json', 60), DOMAINS)
+
+    async def test_hit_skips_request(self):
+        self.process.return_value = DOMAINS
+        await self.kh.get_urls()
+        urls = await self.kh.get_urls()
+        self.assertEqual(urls.mqtt, 'eu-mqttaiot.3irobotix.net:8883')
+        self.assertEqual(self.request.await_count, 1)
+
+    async def test_no_cache_refetches(self):
+        self.process.return_value = DOMAINS
+        await self.kh.get_urls()
+        self.process.return_value = dict(DOMAINS, MQTT='eu-gamqttaiot.3irobotix.net:8883')
+        urls = await self.kh.get_urls(use_cache=False)
+        self.assertEqual(urls.mqtt, 'eu-gamqttaiot.3irobotix.net:8883')
+        self.assertEqual(self.request.await_count, 2)
+        self.assertEqual(read_cache('domains-eu.json', 60)['MQTT'], 'eu-gamqttaiot.3irobotix.net:8883')
+
+class TestMapData(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.kh = KarcherHome()
+
+    async def test_decode_map(self):
+        data = await self.kh._decode_map(DEVICE, 3, encrypt_map(b'{"map":3}'))
+        self.assertEqual(data, {'map': 3})
+
+    async def test_get_map_data_many(self):
+        in_flight = 0
+        peak = 0
+
+        async def access_url(dev, map):
+            # Later maps resolve first, result order must still follow input
+            await asyncio.sleep(0.01 * (6 - map))
+            return 'https://cdn/' + str(map)
+
+        async def download(url):
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+            return encrypt_map(json.dumps({'map': int(url.rsplit('/', 1)[1])}).encode())
+
+        with mock.patch.object(self.kh, '_get_map_access_url', side_effect=access_url), \
+                mock.patch.object(self.kh, '_download', side_effect=download):
+            data = await self.kh.get_map_data_many(DEVICE, [3, 4, 5], max_concurrency=2)
+
+        self.assertEqual(data, [{'map': 3}, {'map': 4}, {'map': 5}])
+        self.assertLessEqual(peak, 2)
+
+    async def test_get_map_data_many_invalid_concurrency(self):
+        with self.assertRaises(ValueError):
+            await self.kh.get_map_data_many(DEVICE, [3], max_concurrency=0)
+
+    async def test_get_map_data_many_cancels_on_error(self):
+        cancelled = []
+
+        async def access_url(dev, map):
+            if map == 3:
+                raise RuntimeError('access denied')
+            try:
+                await asyncio.Event().wait()
+            except asyncio.CancelledError:
+                cancelled.append(map)
+                raise
+
+        with mock.patch.object(self.kh, '_get_map_access_url', side_effect=access_url):
+            with self.assertRaises(RuntimeError):
+                await self.kh.get_map_data_many(DEVICE, [3, 4, 5])
+
+        self.assertEqual(sorted(cancelled), [4, 5])
@@ -0,0 +1,30 @@
+import unittest
+
+from karcher.utils import get_sign, is_email, md5
+
+class TestUtils(unittest.TestCase):
+
+    def test_is_email(self):
+        self.assertTrue(is_email('user@example.com'))
+        self.assertTrue(is_email('first.last+tag@mail.example.co.uk'))
+
+    def test_is_not_email(self):
+        self.assertFalse(is_email('12345678901'))
+        self.assertFalse(is_email('user@example'))
+        self.assertFalse(is_email('user name@example.com'))
+
+    def test_get_sign_query(self):
+        self.assertEqual(get_sign('auth', '1700000000', 'nonce', 'a=1&b=2'), md5('auth1700000000noncea=1&b=2'))
+
+    def test_get_sign_body(self):
+        sign = get_sign('', '1700000000', 'nonce', {
+            'tenantId': '1528983614213726208',
+            'token': None,
+            'phoneSys': 1,
+            'noticeSetting': {'andIpad': 'abc', 'android': 'abc'},
+        })
+        self.assertEqual(sign, md5('1700000000nonce' + 'tenantId1528983614213726208' + 'tokennull' + 'phoneSys1' + 'noticeSetting{"andIpad":"abc","android":"abc"}'))
+
+    def test_get_sign_body_non_ascii(self):
+        sign = get_sign('', '1700000000', 'nonce', {'noticeSetting': {'android': 'R\u20acg'}})
+        self.assertEqual(sign, md5('1700000000nonce' + 'noticeSetting{"android":"R\\u20acg"}'))